@@ -1,21 +1,124 @@
+import copy
 import os
-from ruamel.yaml import YAML
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 
-def parse_jenkinsfile(jenkinsfile_content: str):
+import yaml
+
+from tools.yaml_quote import yaml_scalar
+
+# libyaml's C emitter when PyYAML was built with it, pure-Python otherwise
+_YAML_DUMPER = yaml.CSafeDumper if yaml.__with_libyaml__ else yaml.SafeDumper
+
+# Backend for workflows _render_workflow cannot template. PyYAML covers the plain
+# dicts built here; flip to False to emit through ruamel.yaml instead.
+USE_FAST_YAML = True
+_RUAMEL_YAML = None  # created on first use of the ruamel path, then reused
+
+# Output directories already created by this process (batch runs reuse them)
+_ENSURED_DIRS = set()
+
+# Stage openers we react to: stage('name') or stage("name"). One alternation walked
+# once per file; lowercase because it only ever runs against the lowercased text.
+_STAGE_NAMES = ('checkout', 'build', 'test', 'deploy')  # same order as _STAGES below
+_STAGE_RE = re.compile(rb"stage\(\s*['\"](%s)['\"]\s*\)" % '|'.join(_STAGE_NAMES).encode('ascii'))
+
+# Literal markers the converter branches on (already lowercase), matched in one
+# pass over the lowercased Jenkinsfile bytes. Longest first so 'mvn clean compile' wins over 'mvn'.
+_DOTNET_MARKERS = ('dotnet restore', 'dotnet build', 'dotnet test', 'dotnet publish', 'dotnet --info')
+_MARKERS = _DOTNET_MARKERS + ('mvn', 'mvn clean compile', 'mvn test', 'checkout scm', 'scp')
+_MARKER_RE = re.compile(b'|'.join(re.escape(m.encode('ascii')) for m in sorted(_MARKERS, key=len, reverse=True)))
+# A hit on a longer marker also counts as a hit on every marker it contains
+# (marker -> its offset inside the longer hit)
+_IMPLIED_MARKERS = {m.encode('ascii'): {o: m.index(o) for o in _MARKERS if o in m} for m in _MARKERS}
+
+def _scan_markers(low: bytes) -> dict:
+    """Map each marker present in `low` to the offset of its first occurrence."""
+    offsets = {}
+    for m in _MARKER_RE.finditer(low):
+        for marker, delta in _IMPLIED_MARKERS[m.group(0)].items():
+            offsets.setdefault(marker, m.start() + delta)
+    return offsets
+
+_TOOLCHAIN_STEPS = {
+    'dotnet': {
+        'name': 'Set up .NET',
+        'uses': 'actions/setup-dotnet@v4',
+        'with': {'dotnet-version': '8.0.x'}
+    },
+    'maven': {
+        'name': 'Set up JDK 11',
+        'uses': 'actions/setup-java@v4',
+        'with': {'distribution': 'temurin', 'java-version': '11'}
+    },
+}
+
+# Stage emitters: (stack, marker offsets) -> steps to append
+
+def _checkout_steps(stack, offsets):
+    return [{'name': 'Checkout code', 'uses': 'actions/checkout@v4'}]
+
+def _build_steps(stack, offsets):
+    if stack == 'dotnet':
+        if 'dotnet restore' in offsets:
+            return [{'name': 'Restore packages', 'run': 'dotnet restore'},
+                    {'name': 'Build the project', 'run': 'dotnet build --configuration Release --no-restore'}]
+        return [{'name': 'Build the project', 'run': 'dotnet build --configuration Release'}]
+    if stack == 'maven':
+        return [{'name': 'Build the project', 'run': 'mvn clean compile'}]
+    # Unknown stack: be safe and do nothing (or choose a default you prefer)
+    return []
+
+def _test_steps(stack, offsets):
+    if stack == 'dotnet':
+        return [{'name': 'Run tests', 'run': 'dotnet test --configuration Release'}]
+    if stack == 'maven':
+        return [{'name': 'Run tests', 'run': 'mvn test'}]
+    return []
+
+def _deploy_steps(stack, offsets):
+    # Left generic
+    return [{
+        'name': 'Deploy the project',
+        'run': ('echo "Add your .NET deploy command here (e.g., az webapp deploy, dotnet publish + rsync/scp)"'
+                if stack == 'dotnet'
+                else 'scp target/myapp.war user@server:/path/to/deploy')
+    }]
+
+# (stage name, markers that imply the stage without a stage() block, emitter)
+_STAGES = (
+    ('checkout', ('checkout scm',), _checkout_steps),
+    ('build', ('mvn clean compile', 'dotnet build'), _build_steps),
+    ('test', ('mvn test', 'dotnet test'), _test_steps),
+    ('deploy', ('scp',), _deploy_steps),
+)
+
+def parse_jenkinsfile(jenkinsfile_content):
     """
     Parse Jenkinsfile and emit a single-job GitHub Actions workflow.
     Supports .NET and Maven (Java). Prefers .NET if both are detected.
+    Takes the raw file bytes; text is accepted too and encoded first.
+    Identical content is parsed once; callers get their own copy of the result.
     """
-    text = jenkinsfile_content or ""
-    low  = text.lower()
+    data = jenkinsfile_content or b""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    pipeline, stack = _parse_jenkinsfile_cached(data)
+    # Reported on every call, cache hit or not
+    print(f"[converter] Detected stack: {stack or 'unknown'}")
+    return copy.deepcopy(pipeline)
 
-    def has(pattern: str) -> bool:
-        return pattern.lower() in low
+@lru_cache(maxsize=128)
+def _parse_jenkinsfile_cached(data: bytes):
+    """(workflow dict, detected stack or None) for one Jenkinsfile's bytes."""
+    # All markers are ASCII, so bytes.lower() is enough and skips decoding
+    low  = data.lower()
+    offsets = _scan_markers(low)
 
-    def has_stage(name: str) -> bool:
-        # match stage('Name') or stage("Name"), ignore spacing/case
-        return re.search(rf"stage\(\s*['\"]{re.escape(name)}['\"]\s*\)", low, re.IGNORECASE) is not None
+    # Cheap literal check first: no 'stage(' means the stage regex cannot match
+    stages = {m.group(1).decode('ascii') for m in _STAGE_RE.finditer(low)} if b'stage(' in low else set()
 
     pipeline = {
         'name': 'CI Workflow',
@@ -25,86 +128,161 @@ def parse_jenkinsfile(jenkinsfile_content: str):
     steps = pipeline['jobs']['ci']['steps']
 
     # ---- Stack detection (case-insensitive) ----
-    dotnet_markers = ['dotnet restore', 'dotnet build', 'dotnet test', 'dotnet publish', 'dotnet --info']
-    is_dotnet = any(m in low for m in dotnet_markers)
+    is_dotnet = any(m in offsets for m in _DOTNET_MARKERS)
 
     # Be strict: only call it Maven if we actually see 'mvn'
-    is_maven = 'mvn' in low
+    is_maven = 'mvn' in offsets
 
     # Prefer .NET if both appear
     stack = 'dotnet' if is_dotnet else ('maven' if is_maven else None)
-    print(f"[converter] Detected stack: {stack or 'unknown'}")
 
-    # ---- Checkout ----
-    if has_stage('Checkout') or has('checkout scm'):
-        steps.append({'name': 'Checkout code', 'uses': 'actions/checkout@v4'})
+    # ---- Toolchain setup (always first) ----
+    if stack in _TOOLCHAIN_STEPS:
+        steps.append(_TOOLCHAIN_STEPS[stack])
 
-    # ---- Toolchain setup ----
-    if stack == 'dotnet':
-        steps.insert(0, {
-            'name': 'Set up .NET',
-            'uses': 'actions/setup-dotnet@v4',
-            'with': {'dotnet-version': '8.0.x'}
-        })
-    elif stack == 'maven':
-        steps.insert(0, {
-            'name': 'Set up JDK 11',
-            'uses': 'actions/setup-java@v4',
-            'with': {'distribution': 'temurin', 'java-version': '11'}
-        })
-
-    # ---- Build ----
-    if has_stage('Build') or has('mvn clean compile') or has('dotnet build'):
-        if stack == 'dotnet':
-            if has('dotnet restore'):
-                steps.append({'name': 'Restore packages', 'run': 'dotnet restore'})
-                steps.append({'name': 'Build the project', 'run': 'dotnet build --configuration Release --no-restore'})
+    # ---- Stages, in workflow order ----
+    for stage, markers, emit in _STAGES:
+        if stage in stages or any(m in offsets for m in markers):
+            steps.extend(emit(stack, offsets))
+
+    return pipeline, stack
+
+def _yaml_scalar(value):
+    # Non-strings and non-printable text are left to the full dumper
+    if not isinstance(value, str) or not value.isprintable():
+        return None
+    return yaml_scalar(value)
+
+def _render_head(name, branches, runs_on):
+    # Everything above the step list; None if a value needs more than the template
+    name, runs_on = _yaml_scalar(name), _yaml_scalar(runs_on)
+    branches = [_yaml_scalar(b) for b in branches]
+    if name is None or runs_on is None or None in branches:
+        return None
+    lines = [f"name: {name}", "on:", "  push:", "    branches:"]
+    lines += [f"    - {b}" for b in branches]
+    lines += ["jobs:", "  ci:", f"    runs-on: {runs_on}", ""]
+    return "\n".join(lines).encode('utf-8')
+
+def _render_steps(steps):
+    if not steps:
+        return b"    steps: []\n"
+    lines = ["    steps:"]
+    for step in steps:
+        prefix = "    - "
+        for key, value in step.items():
+            if key == 'with' and isinstance(value, dict):
+                lines.append(f"{prefix}with:")
+                for wkey, wvalue in value.items():
+                    wkey, wvalue = _yaml_scalar(wkey), _yaml_scalar(wvalue)
+                    if wkey is None or wvalue is None:
+                        return None
+                    lines.append(f"        {wkey}: {wvalue}")
             else:
-                steps.append({'name': 'Build the project', 'run': 'dotnet build --configuration Release'})
-        elif stack == 'maven':
-            steps.append({'name': 'Build the project', 'run': 'mvn clean compile'})
-        else:
-            # Unknown stack: be safe and do nothing (or choose a default you prefer)
-            pass
-
-    # ---- Test ----
-    if has_stage('Test') or has('mvn test') or has('dotnet test'):
-        if stack == 'dotnet':
-            steps.append({'name': 'Run tests', 'run': 'dotnet test --configuration Release'})
-        elif stack == 'maven':
-            steps.append({'name': 'Run tests', 'run': 'mvn test'})
-        else:
-            pass
+                key, value = _yaml_scalar(key), _yaml_scalar(value)
+                if key is None or value is None:
+                    return None
+                lines.append(f"{prefix}{key}: {value}")
+            prefix = "      "
+    return ("\n".join(lines) + "\n").encode('utf-8')
 
-    # ---- Deploy (left generic) ----
-    if has_stage('Deploy') or has('scp'):
-        steps.append({
-            'name': 'Deploy the project',
-            'run': ('echo "Add your .NET deploy command here (e.g., az webapp deploy, dotnet publish + rsync/scp)"'
-                    if stack == 'dotnet'
-                    else 'scp target/myapp.war user@server:/path/to/deploy')
-        })
+def _render_workflow(pipeline):
+    """
+    Render the fixed workflow shape produced by parse_jenkinsfile as UTF-8 YAML.
+    Returns None for anything outside that shape so the caller can fall back
+    to a real YAML emitter.
+    """
+    def keys(obj):
+        return list(obj) if isinstance(obj, dict) else None
+
+    if keys(pipeline) != ['name', 'on', 'jobs'] or keys(pipeline['jobs']) != ['ci']:
+        return None
+    if keys(pipeline['on']) != ['push'] or keys(pipeline['on']['push']) != ['branches']:
+        return None
+    push, job = pipeline['on']['push'], pipeline['jobs']['ci']
+    if keys(job) != ['runs-on', 'steps'] or not all(isinstance(st, dict) for st in job['steps']):
+        return None
+
+    if (pipeline['name'], push['branches'], job['runs-on']) == _DEFAULT_HEAD_VALUES:
+        head = _DEFAULT_HEAD
+    else:
+        head = _render_head(pipeline['name'], push['branches'], job['runs-on'])
+    body = _render_steps(job['steps'])
+    if head is None or body is None:
+        return None
+    return head + body
 
-    return pipeline
+# Every workflow parse_jenkinsfile builds shares this head; render it once
+_DEFAULT_HEAD_VALUES = ('CI Workflow', ['main'], 'ubuntu-latest')
+_DEFAULT_HEAD = _render_head(*_DEFAULT_HEAD_VALUES)
+
+def _ruamel_yaml():
+    global _RUAMEL_YAML
+    if _RUAMEL_YAML is None:
+        from ruamel.yaml import YAML
+        # Safe typ with the C emitter: no comment/anchor round-trip state to carry
+        _RUAMEL_YAML = YAML(typ='safe', pure=False)
+        _RUAMEL_YAML.default_flow_style = False
+        _RUAMEL_YAML.sort_base_mapping_type_on_output = False
+    return _RUAMEL_YAML
+
+def _dump_yaml(obj, stream):
+    # stream is a binary file: both emitters write UTF-8 bytes straight into it
+    if USE_FAST_YAML:
+        yaml.dump(obj, stream, Dumper=_YAML_DUMPER, encoding='utf-8',
+                  default_flow_style=False, sort_keys=False)
+        return
+    _ruamel_yaml().dump(obj, stream)
+
+def _ensure_dir(path):
+    if path not in _ENSURED_DIRS:
+        os.makedirs(path, exist_ok=True)
+        _ENSURED_DIRS.add(path)
 
 def convert_jenkinsfile_to_github_actions(jenkinsfile_path, output_dir):
-    with open(jenkinsfile_path, 'r') as jenkinsfile:
+    with open(jenkinsfile_path, 'rb') as jenkinsfile:
         jenkinsfile_content = jenkinsfile.read()
 
     github_actions_yaml = parse_jenkinsfile(jenkinsfile_content)
 
     workflow_dir = os.path.join(output_dir, 'workflows')
-    os.makedirs(workflow_dir, exist_ok=True)
+    _ensure_dir(workflow_dir)
     output_file_path = os.path.join(workflow_dir, 'ci-workflow.yml')
 
-    yaml = YAML()
-    yaml.default_flow_style = False
-    with open(output_file_path, 'w') as yaml_file:
-        yaml.dump(github_actions_yaml, yaml_file)
+    rendered = _render_workflow(github_actions_yaml)
+    with open(output_file_path, 'wb') as yaml_file:
+        if rendered is not None:
+            yaml_file.write(rendered)
+        else:
+            _dump_yaml(github_actions_yaml, yaml_file)
 
     print(f"GitHub Actions workflow generated and saved to {output_file_path}")
 
+def _convert_one(jenkinsfile_path):
+    # Workflow lands next to the Jenkinsfile, under <dir>/.github/workflows
+    output_dir = os.path.join(os.path.dirname(jenkinsfile_path), '.github')
+    convert_jenkinsfile_to_github_actions(jenkinsfile_path, output_dir)
+
+def main_batch(paths):
+    """
+    Convert many Jenkinsfiles in parallel, one worker process per CPU core.
+    Patterns are compiled at import, so each worker pays that cost once.
+    """
+    existing = []
+    for path in paths:
+        if os.path.exists(path):
+            existing.append(path)
+        else:
+            print(f"Jenkinsfile not found at {path}")
+    with ProcessPoolExecutor() as ex:
+        list(ex.map(_convert_one, existing))
+
 def main():
+    if not yaml.__with_libyaml__:
+        print("[converter] PyYAML built without libyaml; using the pure-Python emitter", file=sys.stderr)
+    if len(sys.argv) > 1:
+        main_batch(sys.argv[1:])
+        return
     jenkinsfile_path = 'Jenkinsfile'
     output_dir = '.github'
     if not os.path.exists(jenkinsfile_path):
@@ -2,78 +2,252 @@
 import argparse
 import base64
 import csv
+import hashlib
 import json
 import logging
 import os
 import re
 import sys
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, Any, Tuple, Optional, List
+from urllib.parse import quote
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json is used without it
+    orjson = None
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 
+# Records processed concurrently; bounded to stay clear of ADO rate limits
+MAX_WORKERS = 16
+
+# ---------- JSON helpers ----------
+
+def json_loads(data: bytes) -> Any:
+    return orjson.loads(data) if orjson else json.loads(data)
+
+def json_dumps(obj: Any) -> str:
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode("utf-8")
+    return json.dumps(obj, indent=2)
+
+def json_line(obj: Any) -> str:
+    if orjson:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, separators=(",", ":"))
+
 # ---------- ADO HTTP helpers ----------
 
-def _headers(pat: str) -> Dict[str, str]:
-    auth = base64.b64encode(f":{pat}".encode("ascii")).decode("ascii")
-    return {"Accept": "application/json", "Authorization": f"Basic {auth}"}
+class AdoRetry(Retry):
+    """
+    GETs retry on throttling / transient 5xx (allowed_methods). POSTs retry on 429
+    only: ADO applies nothing it throttles, so replaying a 429'd repo create, push
+    or PR can't duplicate it. Retry-After is honoured either way.
+    """
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if method == "POST" and status_code == 429:
+            return True
+        return super().is_retry(method, status_code, has_retry_after)
 
-def list_projects(org: str, headers: Dict[str,str]) -> List[str]:
+def _session(pat: str, pool_size: int = 32) -> requests.Session:
+    """
+    One keep-alive session for every ADO call in a run: pooled connections
+    (no TLS handshake per request) and AdoRetry: GETs retry on throttling /
+    transient 5xx, POSTs (repo create, push, PR) only on 429 - after a 5xx or a
+    lost response the first attempt may already have been applied.
+    pool_block makes callers wait for a free connection instead of opening
+    throwaway ones, so the socket count never exceeds pool_size.
+    """
+    session = requests.Session()
+    # Encoded once here; every helper goes through this session, so no call re-derives it
+    session.headers["Accept"] = "application/json"
+    session.headers["Authorization"] = "Basic " + base64.b64encode(f":{pat}".encode("ascii")).decode("ascii")
+    retry = AdoRetry(total=5, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=["GET"], raise_on_status=False)
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                                          pool_block=True, max_retries=retry))
+    return session
+
+def list_projects(org: str, session: requests.Session) -> List[str]:
     url = f"https://dev.azure.com/{org}/_apis/projects?api-version=7.0"
-    r = requests.get(url, headers=headers, timeout=30)
-    r.raise_for_status()
-    return [p["name"] for p in r.json().get("value", [])]
+    data = get_json(url, ("projects", org), session)
+    return [p["name"] for p in data.get("value", [])]
 
-def list_repos(org: str, project: str, headers: Dict[str,str]) -> Dict[str,str]:
+def list_repos(org: str, project: str, session: requests.Session) -> Dict[str,str]:
     url = f"https://dev.azure.com/{org}/{project}/_apis/git/repositories?api-version=7.0"
-    r = requests.get(url, headers=headers, timeout=30)
+    data = get_json(url, ("repos", org, project), session)
+    return {repo["name"]: repo["id"] for repo in data.get("value", [])}
+
+# Project/repo listings are stable for the length of a run: fetch each once.
+# Entries are Futures so concurrent records wait on one in-flight request.
+_LISTING_CACHE: Dict[Tuple[str, ...], Future] = {}
+_LISTING_LOCK = threading.Lock()
+
+def _cached_listing(key: Tuple[str, ...], fetch):
+    with _LISTING_LOCK:
+        fut = _LISTING_CACHE.get(key)
+        owner = fut is None
+        if owner:
+            fut = _LISTING_CACHE[key] = Future()
+    if owner:
+        try:
+            fut.set_result(fetch())
+        except Exception as e:
+            # Don't pin a failure: drop it so a later record can retry
+            with _LISTING_LOCK:
+                _LISTING_CACHE.pop(key, None)
+            fut.set_exception(e)
+    return fut.result()
+
+# Catalogs also change rarely between runs, so they are persisted as
+# <cache-dir>/<kind>-<digest>.json = {"ts": epoch, "data": ...}, where the digest
+# covers every key part (so names containing '-' can't collide) and the identity,
+# a fingerprint of the PAT, so one token never reads another's listings.
+# Set from --cache-dir/--cache-ttl in main; ttl <= 0 (the default) disables the disk layer.
+DISK_CACHE: Dict[str, Any] = {"dir": None, "ttl": 0, "identity": ""}
+
+def _disk_cache_path(key: Tuple[str, ...]) -> Optional[Path]:
+    if not DISK_CACHE["dir"] or DISK_CACHE["ttl"] <= 0:
+        return None
+    digest = hashlib.sha256("\0".join((DISK_CACHE["identity"],) + key).encode("utf-8")).hexdigest()[:32]
+    return Path(DISK_CACHE["dir"]) / f"{key[0]}-{digest}.json"
+
+def _disk_read(path: Optional[Path]) -> Optional[Dict[str, Any]]:
+    if path is None:
+        return None
+    try:
+        entry = json_loads(path.read_bytes())
+    except (OSError, ValueError):
+        return None
+    return entry if isinstance(entry, dict) else None
+
+def _disk_write(path: Optional[Path], entry: Dict[str, Any]) -> None:
+    if path is None:
+        return
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json_line(entry), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError as e:
+        logging.debug("Could not write cache %s: %s", path, e)
+
+def _disk_cached(key: Tuple[str, ...], fetch):
+    path = _disk_cache_path(key)
+    entry = _disk_read(path)
+    if entry and "data" in entry and time.time() - entry.get("ts", 0) < DISK_CACHE["ttl"]:
+        return entry["data"]
+    data = fetch()
+    _disk_write(path, {"ts": time.time(), "data": data})
+    return data
+
+def drop_disk_cache(*key: str) -> None:
+    path = _disk_cache_path(key)
+    if path is not None:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+def cached_list_projects(org: str, session: requests.Session) -> List[str]:
+    key = ("projects", org)
+    return _cached_listing(key, lambda: _disk_cached(key, lambda: list_projects(org, session)))
+
+def cached_list_repos(org: str, project: str, session: requests.Session) -> Dict[str,str]:
+    key = ("repos", org, project)
+    return _cached_listing(key, lambda: _disk_cached(key, lambda: list_repos(org, project, session)))
+
+def refresh_list_repos(org: str, project: str, session: requests.Session) -> Dict[str,str]:
+    """
+    The project's repos fetched past the TTL disk layer (at most once per run), for
+    when the cached listing misses a name: the repo may have been created since the
+    cache was written. Rewrites the disk entry with what it finds.
+    """
+    key = ("repos", org, project)
+    def fetch() -> Dict[str,str]:
+        repos = list_repos(org, project, session)
+        _disk_write(_disk_cache_path(key), {"ts": time.time(), "data": repos})
+        return repos
+    return _cached_listing(("repos-live", org, project), fetch)
+
+def get_json(url: str, key: Tuple[str, ...], session: requests.Session, missing_ok: bool = False) -> Any:
+    """
+    GET a JSON resource (None on 404 when missing_ok). The last body is kept in
+    the disk cache with its ETag and revalidated with If-None-Match, so an
+    unchanged resource comes back as a bodiless 304 with nothing to parse.
+    """
+    path = _disk_cache_path(("etag",) + key)
+    cached = _disk_read(path)
+    etag = cached.get("etag") if cached and "data" in cached else None
+    r = session.get(url, headers={"If-None-Match": etag} if etag else None, timeout=30)
+    if r.status_code == 304 and etag:
+        return cached["data"]
+    if r.status_code == 404 and missing_ok:
+        return None
     r.raise_for_status()
-    return {repo["name"]: repo["id"] for repo in r.json().get("value", [])}
+    data = json_loads(r.content)
+    if r.headers.get("ETag"):
+        _disk_write(path, {"etag": r.headers["ETag"], "data": data})
+    return data
+
+def get_repo_by_name(org: str, project: str, name: str, session: requests.Session) -> Optional[Dict[str,Any]]:
+    """Single-repo lookup; ADO accepts the repo name in place of its id. None if it doesn't exist."""
+    url = f"https://dev.azure.com/{org}/{project}/_apis/git/repositories/{quote(name, safe='')}?api-version=7.0"
+    return get_json(url, ("repo", org, project, name.lower()), session, missing_ok=True)
 
-def get_repo_meta(org: str, project: str, repo_id: str, headers: Dict[str,str]) -> Dict[str,Any]:
+def get_repo_meta(org: str, project: str, repo_id: str, session: requests.Session) -> Dict[str,Any]:
     url = f"https://dev.azure.com/{org}/{project}/_apis/git/repositories/{repo_id}?api-version=7.0"
-    r = requests.get(url, headers=headers, timeout=30)
-    r.raise_for_status()
-    return r.json()
+    return get_json(url, ("repo", org, repo_id), session)
 
-def branch_tip(org: str, project: str, repo_id: str, branch: str, headers: Dict[str,str]) -> Optional[str]:
-    url = f"https://dev.azure.com/{org}/{project}/_apis/git/repositories/{repo_id}/refs?filter=heads/{branch}&api-version=7.0"
-    r = requests.get(url, headers=headers, timeout=30)
-    if r.status_code != 200:
-        return None
-    data = r.json()
-    return data["value"][0]["objectId"] if data.get("value") else None
+def list_heads(org: str, project: str, repo_id: str, session: requests.Session) -> Dict[str,str]:
+    """All branch tips of a repo in one call: branch name -> objectId."""
+    url = f"https://dev.azure.com/{org}/{project}/_apis/git/repositories/{repo_id}/refs?filter=heads/&api-version=7.0"
+    data = get_json(url, ("heads", org, repo_id), session)
+    prefix = "refs/heads/"
+    return {ref["name"][len(prefix):]: ref["objectId"] for ref in data.get("value", [])}
 
-def create_repo(org: str, project: str, name: str, headers: Dict[str,str]) -> Tuple[bool,str,str]:
+def cached_list_heads(org: str, project: str, repo_id: str, session: requests.Session) -> Dict[str,str]:
+    return _cached_listing(("heads", org, project, repo_id), lambda: list_heads(org, project, repo_id, session))
+
+def create_repo(org: str, project: str, name: str, session: requests.Session) -> Tuple[bool,str,str]:
     url = f"https://dev.azure.com/{org}/{project}/_apis/git/repositories?api-version=7.0"
-    r = requests.post(url, headers=headers, json={"name": name}, timeout=30)
+    r = session.post(url, json={"name": name}, timeout=30)
     if r.status_code not in (200,201):
         return False, f"Create repo failed: {r.status_code} {r.text}", ""
     repo = r.json()
     return True, "Repo created", repo["id"]
 
 def push_new_branch(org: str, project: str, repo_id: str, yaml_path: str, yaml_content: str,
-                    base_branch: str, new_branch: str, headers: Dict[str,str]) -> Tuple[bool,str,str,str]:
+                    base_branch: str, new_branch: str, session: requests.Session) -> Tuple[bool,str,str,str]:
     """
     Returns (ok, msg, effective_base_branch, created_mode)
     created_mode in {"normal", "initialized_base"}.
     - normal: repo had commits; we pushed feature branch from base tip
     - initialized_base: repo was empty; we created the first commit on base_branch
     """
-    # Try the requested base branch
-    tip = branch_tip(org, project, repo_id, base_branch, headers)
+    # Try the requested base branch (all heads come back in one call)
+    try:
+        heads = cached_list_heads(org, project, repo_id, session)
+    except Exception:
+        heads = {}
+    tip = heads.get(base_branch)
 
     # If not found, try the repo default branch
     if not tip:
-        meta = get_repo_meta(org, project, repo_id, headers)
+        meta = get_repo_meta(org, project, repo_id, session)
         default_ref = (meta.get("defaultBranch") or "refs/heads/main")
         default_branch = default_ref.split("/")[-1]
         if default_branch != base_branch:
             base_branch = default_branch
-        tip = branch_tip(org, project, repo_id, base_branch, headers)
+        tip = heads.get(base_branch)
 
     url = f"https://dev.azure.com/{org}/{project}/_apis/git/repositories/{repo_id}/pushes?api-version=7.0"
 
@@ -93,9 +267,11 @@ def push_new_branch(org: str, project: str, repo_id: str, yaml_path: str, yaml_c
                 }]
             }]
         }
-        r = requests.post(url, headers=headers, json=payload, timeout=60)
+        r = session.post(url, json=payload, timeout=60)
         if r.status_code not in (200, 201):
             return False, f"Initial push (empty repo) failed: {r.status_code} {r.text}", base_branch, "normal"
+        with _LISTING_LOCK:
+            _LISTING_CACHE.pop(("heads", org, project, repo_id), None)
         return True, f"Initialized empty repo on '{base_branch}' with first commit", base_branch, "initialized_base"
 
     # Non-empty repo: push a new feature branch from tip
@@ -110,14 +286,14 @@ def push_new_branch(org: str, project: str, repo_id: str, yaml_path: str, yaml_c
             }]
         }]
     }
-    r = requests.post(url, headers=headers, json=payload, timeout=60)
+    r = session.post(url, json=payload, timeout=60)
     if r.status_code not in (200, 201):
         return False, f"Push failed: {r.status_code} {r.text}", base_branch, "normal"
     return True, "Branch pushed", base_branch, "normal"
 
 
 def open_pr(org: str, project: str, repo_id: str, source_branch: str, target_branch: str,
-            title: str, description: str, headers: Dict[str,str]) -> Tuple[bool,str]:
+            title: str, description: str, session: requests.Session) -> Tuple[bool,str]:
     url = f"https://dev.azure.com/{org}/{project}/_apis/git/repositories/{repo_id}/pullrequests?api-version=7.0"
     body = {
         "sourceRefName": f"refs/heads/{source_branch}",
@@ -125,14 +301,51 @@ def open_pr(org: str, project: str, repo_id: str, source_branch: str, target_bra
         "title": title,
         "description": description
     }
-    r = requests.post(url, headers=headers, json=body, timeout=60)
+    r = session.post(url, json=body, timeout=60)
     if r.status_code not in (200,201):
         return False, f"Create PR failed: {r.status_code} {r.text}"
     pr = r.json()
     return True, f"PR #{pr.get('pullRequestId')} created"
 
+def build_repo_index(org: str, projects: List[str], session: requests.Session,
+                     workers: int = MAX_WORKERS, lister=cached_list_repos) -> Dict[str, Tuple[str,str]]:
+    """
+    Map repo name -> (project, repo_id) across the given projects, listing them in parallel.
+    The first project (in list order) that has a given name wins.
+    """
+    def fetch(proj: str) -> Dict[str,str]:
+        try:
+            return lister(org, proj, session)
+        except Exception as e:
+            logging.warning("List repos failed for %s/%s: %s", org, proj, e)
+            return {}
+
+    index: Dict[str, Tuple[str,str]] = {}
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        for proj, repos in zip(projects, ex.map(fetch, projects)):
+            for name, rid in repos.items():
+                if name in index:
+                    logging.debug("Repo '%s' also in project %s; keeping %s", name, proj, index[name][0])
+                    continue
+                index[name] = (proj, rid)
+    return index
+
+def refresh_repo_index(org: str, session: requests.Session, workers: int = MAX_WORKERS) -> Dict[str, Tuple[str,str]]:
+    """
+    build_repo_index over live project and repo listings (at most once per run), for
+    when the disk-cached index misses a name and the record would otherwise create a
+    duplicate in the default project. Rewrites the disk entries it passes.
+    """
+    def fetch() -> Dict[str, Tuple[str,str]]:
+        projects = list_projects(org, session)
+        _disk_write(_disk_cache_path(("projects", org)), {"ts": time.time(), "data": projects})
+        return build_repo_index(org, projects, session, workers, lister=refresh_list_repos)
+    return _cached_listing(("index-live", org), fetch)
+
 # ---------- Mapping & inputs ----------
 
+_PROTO_RE = re.compile(r"^[a-zA-Z]+://(.+)$")
+
 def repo_name_from_source(source: Optional[str]) -> Optional[str]:
     """
     Extract repository name (without .git) from URL/SSH/path.
@@ -146,11 +359,11 @@ def repo_name_from_source(source: Optional[str]) -> Optional[str]:
 
     # SSH like git@host:org/repo(.git)
     if s.startswith("git@"):
-        after_colon = s.split(":", 1)[-1]
+        after_colon = s[s.find(":") + 1:]
         base = os.path.basename(after_colon.rstrip("/"))
     else:
         # Strip protocol if present
-        m = re.match(r"^[a-zA-Z]+://(.+)$", s)
+        m = _PROTO_RE.match(s)
         if m:
             s = m.group(1)
         base = os.path.basename(s.rstrip("/"))
@@ -175,8 +388,74 @@ def load_targets_csv(path: str) -> Dict[str, Dict[str,str]]:
                 out[src] = row
     return out
 
-def boolish(val: str) -> bool:
-    return str(val).strip().lower() in ("1","true","yes","y","on")
+SKIP_DIRS = {"node_modules", "__pycache__", "venv"}
+
+def find_outputs(root: str, parent_summary: Optional[str] = None):
+    """
+    Recursively yield (azure-pipelines.yml, summary.json or None) under root,
+    without descending into hidden dirs (.git etc.) or SKIP_DIRS. The summary is
+    the yml's sibling, else the one in the parent dir. Both come from the scandir
+    listings, so there are no extra stats and no opens of files that don't exist.
+    """
+    subdirs, yml, summary = [], None, None
+    try:
+        with os.scandir(root) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if not entry.name.startswith(".") and entry.name not in SKIP_DIRS:
+                        subdirs.append(entry.path)
+                elif entry.name == "azure-pipelines.yml" and entry.is_file():
+                    yml = entry.path
+                elif entry.name == "summary.json" and entry.is_file():
+                    summary = entry.path
+    except OSError:
+        return
+    if yml:
+        found = summary or parent_summary
+        yield Path(yml), Path(found) if found else None
+    for d in subdirs:
+        yield from find_outputs(d, summary)
+
+def read_conversion_output(item: Tuple[Path, Optional[Path]]) -> Dict[str, Any]:
+    """Build the record for one (azure-pipelines.yml, summary.json) pair from find_outputs."""
+    yml, summary_path = item
+    base_dir = yml.parent
+
+    summary_raw = None
+    if summary_path is not None:
+        try:
+            summary_raw = summary_path.read_bytes()
+        except OSError:
+            summary_path = None
+
+    # Derive slug from the closest meaningful folder
+    # Prefer the immediate containing folder; strip known prefixes
+    slug = base_dir.name
+    if slug.startswith("ado-yaml-"):
+        slug = slug[len("ado-yaml-"):]
+    # If we’re under .../out/<slug>, pick that slug
+    if base_dir.name != "out" and base_dir.parent.name == "out":
+        slug = base_dir.name
+
+    summary = {}
+    source = None
+    if summary_raw is not None:
+        try:
+            summary = json_loads(summary_raw)
+            source = summary.get("repo") or summary.get("source") or summary.get("origin")
+        except Exception as e:
+            logging.warning("Failed to parse %s: %s", summary_path, e)
+
+    if not source:
+        source = slug  # last resort
+
+    return {
+        "slug": slug,
+        "yaml_path": str(yml),
+        "summary_path": str(summary_path) if summary_path else None,
+        "source": source,
+        "summary": summary or {},
+    }
 
 def collect_conversion_outputs(in_root: str):
     """
@@ -196,49 +475,162 @@ def collect_conversion_outputs(in_root: str):
         logging.error("Input root does not exist: %s", in_root)
         return
 
-    # Strategy: find every azure-pipelines.yml recursively, then look for a sibling summary.json
-    for yml in root.rglob("azure-pipelines.yml"):
-        base_dir = yml.parent
-
-        # Try sibling summary.json; if not found, try parent
-        summary_path = base_dir / "summary.json"
-        if not summary_path.is_file():
-            maybe = base_dir.parent / "summary.json"
-            if maybe.is_file():
-                summary_path = maybe
-            else:
-                summary_path = None
-
-        # Derive slug from the closest meaningful folder
-        # Prefer the immediate containing folder; strip known prefixes
-        slug = base_dir.name
-        if slug.startswith("ado-yaml-"):
-            slug = slug[len("ado-yaml-"):]
-        # If we’re under .../out/<slug>, pick that slug
-        if base_dir.name != "out" and base_dir.parent.name == "out":
-            slug = base_dir.name
-
-        summary = {}
-        source = None
-        if summary_path and summary_path.is_file():
-            try:
-                summary = json.loads(summary_path.read_text(encoding="utf-8"))
-                source = summary.get("repo") or summary.get("source") or summary.get("origin")
-            except Exception as e:
-                logging.warning("Failed to parse %s: %s", summary_path, e)
+    # Strategy: find every azure-pipelines.yml (and its summary.json) recursively, then read the summaries
+    # concurrently so disk waits and JSON parsing overlap
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        parent_summary = root.parent / "summary.json"
+        outputs = find_outputs(in_root, str(parent_summary) if parent_summary.is_file() else None)
+        yield from ex.map(read_conversion_output, outputs)
 
-        if not source:
-            source = slug  # last resort
+# ---------- Main ----------
 
-        yield {
-            "slug": slug,
-            "yaml_path": str(yml),
-            "summary_path": str(summary_path) if summary_path and summary_path.is_file() else None,
-            "source": source,
-            "summary": summary or {},
-        }
+def resolve_target(rec: Dict[str, Any], overrides: Dict[str, Dict[str,str]],
+                   args: argparse.Namespace) -> Tuple[Dict[str,str], Optional[Tuple[str,str,str]]]:
+    """
+    Returns (override_row, (org, project, repo_name)).
+    The target is None when no repo name can be inferred from the source.
+    """
+    name_guess = repo_name_from_source(rec["source"])
+    if not name_guess:
+        return {}, None
+    # Prefer exact override by source; fall back to override by repo name
+    row = overrides.get(rec["source"]) or overrides.get(name_guess) or {}
+    target = (row.get("ado_org")     or args.ado_org,
+              row.get("ado_project") or args.ado_project,
+              row.get("ado_repo")    or name_guess)
+    return row, target
+
+def dedupe_records(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Keep one record per resolved ADO target (the most recently written YAML); log the rest."""
+    seen: Dict[Tuple[str,str,str], int] = {}
+    out: List[Dict[str, Any]] = []
+    for rec in records:
+        target = rec["target"]
+        idx = seen.get(target)
+        if idx is None:
+            seen[target] = len(out)
+            out.append(rec)
+            continue
+        kept = out[idx]
+        if os.path.getmtime(rec["yaml_path"]) > os.path.getmtime(kept["yaml_path"]):
+            out[idx], kept, rec = rec, rec, kept
+        logging.warning("Duplicate target %s/%s/%s: using %s, skipping %s",
+                        *target, kept["yaml_path"], rec["yaml_path"])
+    return out
+
+def process_record(rec: Dict[str, Any], session: requests.Session, args: argparse.Namespace,
+                   repo_index: Dict[str, Tuple[str,str]]) -> Dict[str, Any]:
+    """Find or create the resolved ADO repo for one conversion output, push its YAML and open the PR."""
+    auto_scan_all = args.autodiscover_projects
+    create_missing = args.create_if_missing
+
+    slug         = rec["slug"]
+    yaml_path    = rec["yaml_path"]
+    summary      = rec["summary"]
+    source       = rec["source"]
+    row          = rec["row"]
+
+    org, project, repo_name = rec["target"]
+    yaml_repo_path = row.get("yaml_path") or "/azure-pipelines.yml"
+    base_branch = row.get("base_branch")  or "main"
+    new_branch  = row.get("new_branch")   or f"jenkins-migration-{int(time.time())}"
+
+    # 1) Try default project first; a fully specified override needs only a direct GET
+    repo_id = None
+    if row.get("ado_project") and row.get("ado_repo"):
+        try:
+            meta = get_repo_by_name(org, project, repo_name, session)
+            repo_id = meta["id"] if meta else None
+            logging.info("Lookup %s/%s repo '%s' -> %s", org, project, repo_name, repo_id or "not-found")
+        except Exception as e:
+            logging.error("Get repo failed for %s/%s/%s: %s", org, project, repo_name, e)
+    else:
+        try:
+            repos = cached_list_repos(org, project, session)
+            repo_id = repos.get(repo_name)
+            if not repo_id and DISK_CACHE["ttl"] > 0:
+                # Don't create or skip on the word of a possibly stale disk listing
+                repo_id = refresh_list_repos(org, project, session).get(repo_name)
+            logging.info("Lookup %s/%s repo '%s' -> %s", org, project, repo_name, repo_id or "not-found")
+        except Exception as e:
+            logging.error("List repos failed for %s/%s: %s", org, project, e)
+
+    # 2) If not found and autodiscover enabled, look it up in the org-wide index
+    if not repo_id and auto_scan_all and org == args.ado_org:
+        hit = repo_index.get(repo_name)
+        if hit is None and DISK_CACHE["ttl"] > 0:
+            # The index may come from listings cached before the repo was created
+            try:
+                hit = refresh_repo_index(org, session, max(1, args.jobs)).get(repo_name)
+            except Exception as e:
+                logging.error("Refreshing repo index for %s failed: %s", org, e)
+                return {"source": source, "slug": slug, "status": "error",
+                        "message": f"Could not refresh repo index for {org}: {e}"}
+        if hit:
+            project, repo_id = hit
+            logging.info("Found repo '%s' in project %s via autodiscover", repo_name, project)
+
+    # 3) If still not found and create allowed, create in default project
+    if not repo_id and create_missing:
+        ok, msg, rid = create_repo(org, project, repo_name, session)
+        if ok:
+            repo_id = rid
+            # Keep the cached listing in step so later records see the new repo
+            try:
+                cached_list_repos(org, project, session)[repo_name] = rid
+            except Exception:
+                pass
+            with _LISTING_LOCK:
+                _LISTING_CACHE.pop(("repos-live", org, project), None)
+            drop_disk_cache("repos", org, project)
+            logging.info("Created repo %s/%s/%s", org, project, repo_name)
+        else:
+            logging.error("Create repo failed for %s/%s/%s: %s", org, project, repo_name, msg)
+            return {"source": source, "slug": slug, "status": "error", "message": msg}
+
+    if not repo_id:
+        msg = f"Repo '{repo_name}' not found; provide CSV override or enable create/autodiscover"
+        logging.warning(msg)
+        return {"source": source, "slug": slug, "status": "skipped", "message": msg}
+
+    # 4) Push branch with YAML (read only now, so skipped records never touch the file)
+    yaml_content = Path(yaml_path).read_bytes().decode("utf-8")
+    ok_push, msg_push, base_branch_effective, mode = push_new_branch(org, project, repo_id, yaml_repo_path, yaml_content, base_branch, new_branch, session)
+    if not ok_push:
+        logging.error("Push failed for %s/%s/%s: %s", org, project, repo_name, msg_push)
+        # The cached repo id may be stale (repo deleted/renamed); refetch next run
+        drop_disk_cache("repos", org, project)
+        return {"source": source, "slug": slug, "status": "error", "message": msg_push}
+
+    if mode == "initialized_base":
+        # Repo was empty; we created the first commit on base branch.
+        # PR doesn't make sense yet (there's only one branch/commit).
+        msg = f"{msg_push}; PR skipped (repo just initialized on '{base_branch_effective}')."
+        logging.info(msg)
+        return {"source": source, "slug": slug, "status": "success", "message": msg}
+
+    # 5) Open PR
+    title = "Add Azure Pipelines YAML (migrated from Jenkins)"
+    stack = summary.get("stack")
+    conf  = summary.get("confidence")
+    reasons = summary.get("reasons") or []
+    reasons_txt = ", ".join(reasons) if isinstance(reasons, list) else str(reasons)
+
+    desc_lines = [
+        "Automated migration.",
+        "",
+    ]
+    if stack:
+        desc_lines.append(f"Detected stack: {stack}" + (f" (confidence {conf})" if conf is not None else ""))
+    if reasons_txt:
+        desc_lines.append(f"Reasons: {reasons_txt}")
+    description = "\n".join(desc_lines) + "\n"
+
+    ok_pr, msg_pr = open_pr(org, project, repo_id, new_branch, base_branch, title, description, session)
+    status = "success" if ok_pr else "error"
+    logging.log(logging.INFO if ok_pr else logging.ERROR, "PR result for %s/%s/%s: %s", org, project, repo_name, msg_pr)
+    return {"source": source, "slug": slug, "status": status, "message": msg_pr}
 
-# ---------- Main ----------
 
 def main() -> int:
     ap = argparse.ArgumentParser(description="Push generated YAMLs to ADO and open PRs (auto-resolving targets).")
@@ -246,141 +638,83 @@ def main() -> int:
     ap.add_argument("--targets", required=False, default="", help="Optional CSV overrides")
     ap.add_argument("--ado-org", required=True, help="Default ADO org for auto-resolution (slug, not URL)")
     ap.add_argument("--ado-project", required=True, help="Default ADO project for auto-resolution")
-    ap.add_argument("--autodiscover-projects", default="false", help="Scan all org projects to find repo by name (true/false)")
-    ap.add_argument("--create-if-missing", default="false", help="Create repo in default project if not found (true/false)")
+    ap.add_argument("--autodiscover-projects", action=argparse.BooleanOptionalAction, default=False,
+                    help="Scan all org projects to find repo by name")
+    ap.add_argument("--create-if-missing", action=argparse.BooleanOptionalAction, default=False,
+                    help="Create repo in default project if not found")
+    ap.add_argument("--cache-dir", default=os.path.join(os.path.expanduser("~"), ".cache", "ado_open_pr"),
+                    help="Where project/repo listings are cached between runs")
+    ap.add_argument("--cache-ttl", type=int, default=0,
+                    help="Seconds a cached listing stays valid (default 0: no on-disk cache)")
+    ap.add_argument("--jsonl", action="store_true",
+                    help="Stream one JSON line per record plus a final summary line instead of one JSON document")
+    ap.add_argument("--jobs", type=int, default=MAX_WORKERS, help=f"Records processed in parallel (default {MAX_WORKERS})")
     args = ap.parse_args()
 
     pat = os.environ.get("ADO_PAT")
     if not pat:
         print("Missing ADO_PAT env", file=sys.stderr)
         return 1
-    headers = _headers(pat)
+    DISK_CACHE.update(dir=args.cache_dir, ttl=args.cache_ttl,
+                      identity=hashlib.sha256(pat.encode("utf-8")).hexdigest()[:16])
+    # One pooled connection per worker so threads never open throwaway sockets
+    session = _session(pat, pool_size=max(1, args.jobs))
 
     overrides = load_targets_csv(args.targets)
-    auto_scan_all = boolish(args.autodiscover_projects)
-    create_missing = boolish(args.create_if_missing)
+    auto_scan_all = args.autodiscover_projects
 
     records = list(collect_conversion_outputs(args.in_root))
     if not records:
         logging.error("No conversion outputs found under %s", args.in_root)
-        print(json.dumps({"results": [], "message": "no inputs"}, indent=2))
+        print(json_dumps({"results": [], "message": "no inputs"}))
         return 1
+    # Resolve every target once, up front: records with no inferable repo name are
+    # reported here without reaching the pool, and workers reuse (row, target).
+    skipped: List[Dict[str, Any]] = []
+    for rec in records:
+        rec["row"], rec["target"] = resolve_target(rec, overrides, args)
+        if rec["target"] is None:
+            msg = f"Could not infer repo name from source '{rec['source']}' (slug={rec['slug']}); skipping."
+            logging.warning(msg)
+            skipped.append({"source": rec["source"], "slug": rec["slug"], "status": "skipped", "message": msg})
+    records = dedupe_records([rec for rec in records if rec["target"] is not None])
 
-    project_list: List[str] = []
+    repo_index: Dict[str, Tuple[str,str]] = {}
     if auto_scan_all:
         try:
-            project_list = list_projects(args.ado_org, headers)
+            project_list = cached_list_projects(args.ado_org, session)
             logging.info("Autodiscover enabled; found %d projects", len(project_list))
+            repo_index = build_repo_index(args.ado_org, project_list, session, max(1, args.jobs))
         except Exception as e:
             logging.error("List projects failed: %s", e)
 
-    results = []
-    for rec in records:
-        slug         = rec["slug"]
-        yaml_path    = rec["yaml_path"]
-        summary      = rec["summary"]
-        source       = rec["source"]
-        name_guess   = repo_name_from_source(source)
-
-        if not name_guess:
-            msg = f"Could not infer repo name from source '{source}' (slug={slug}); skipping."
-            logging.warning(msg)
-            results.append({"source": source, "slug": slug, "status": "skipped", "message": msg})
-            continue
-
-        # Prefer exact override by source; fall back to override by repo name
-        row = overrides.get(source) or overrides.get(name_guess) or {}
-
-        org         = row.get("ado_org")     or args.ado_org
-        project     = row.get("ado_project") or args.ado_project
-        repo_name   = row.get("ado_repo")    or name_guess
-        yaml_repo_path = row.get("yaml_path") or "/azure-pipelines.yml"
-        base_branch = row.get("base_branch")  or "main"
-        new_branch  = row.get("new_branch")   or f"jenkins-migration-{int(time.time())}"
-
-        yaml_content = Path(yaml_path).read_text(encoding="utf-8")
-
-        # 1) Try default project first
-        repo_id = None
-        try:
-            repos = list_repos(org, project, headers)
-            repo_id = repos.get(repo_name)
-            logging.info("Lookup %s/%s repo '%s' -> %s", org, project, repo_name, repo_id or "not-found")
-        except Exception as e:
-            logging.error("List repos failed for %s/%s: %s", org, project, e)
-
-        # 2) If not found and autodiscover enabled, scan all projects
-        if not repo_id and auto_scan_all and project_list:
-            for proj in project_list:
-                try:
-                    repos = list_repos(org, proj, headers)
-                    if repo_name in repos:
-                        project = proj
-                        repo_id = repos[repo_name]
-                        logging.info("Found repo '%s' in project %s via autodiscover", repo_name, proj)
-                        break
-                except Exception:
-                    continue
-
-        # 3) If still not found and create allowed, create in default project
-        if not repo_id and create_missing:
-            ok, msg, rid = create_repo(org, project, repo_name, headers)
-            if ok:
-                repo_id = rid
-                logging.info("Created repo %s/%s/%s", org, project, repo_name)
-            else:
-                logging.error("Create repo failed for %s/%s/%s: %s", org, project, repo_name, msg)
-                results.append({"source": source, "slug": slug, "status": "error", "message": msg})
-                continue
-
-        if not repo_id:
-            msg = f"Repo '{repo_name}' not found; provide CSV override or enable create/autodiscover"
-            logging.warning(msg)
-            results.append({"source": source, "slug": slug, "status": "skipped", "message": msg})
-            continue
-
-        # 4) Push branch with YAML
-        ok_push, msg_push, base_branch_effective, mode = push_new_branch(org, project, repo_id, yaml_repo_path, yaml_content, base_branch, new_branch, headers)
-        if not ok_push:
-            logging.error("Push failed for %s/%s/%s: %s", org, project, repo_name, msg_push)
-            results.append({"source": source, "slug": slug, "status": "error", "message": msg_push})
-            continue
-
-        if mode == "initialized_base":
-            # Repo was empty; we created the first commit on base branch.
-            # PR doesn't make sense yet (there's only one branch/commit).
-            msg = f"{msg_push}; PR skipped (repo just initialized on '{base_branch_effective}')."
-            logging.info(msg)
-            results.append({"source": source, "slug": slug, "status": "success", "message": msg})
-            continue
-
-        # 5) Open PR
-        title = "Add Azure Pipelines YAML (migrated from Jenkins)"
-        stack = summary.get("stack")
-        conf  = summary.get("confidence")
-        reasons = summary.get("reasons") or []
-        reasons_txt = ", ".join(reasons) if isinstance(reasons, list) else str(reasons)
-
-        desc_lines = [
-            "Automated migration.",
-            "",
-        ]
-        if stack:
-            desc_lines.append(f"Detected stack: {stack}" + (f" (confidence {conf})" if conf is not None else ""))
-        if reasons_txt:
-            desc_lines.append(f"Reasons: {reasons_txt}")
-        description = "\n".join(desc_lines) + "\n"
-
-        ok_pr, msg_pr = open_pr(org, project, repo_id, new_branch, base_branch, title, description, headers)
-        status = "success" if ok_pr else "error"
-        logging.log(logging.INFO if ok_pr else logging.ERROR, "PR result for %s/%s/%s: %s", org, project, repo_name, msg_pr)
-        results.append({"source": source, "slug": slug, "status": status, "message": msg_pr})
-
-    print(json.dumps({"results": results}, indent=2))
+    # Each record is a handful of sequential HTTPS round-trips and records are
+    # independent, so overlap them; the shared session is safe across threads.
+    workers = max(1, min(args.jobs, len(records)))
+    results: List[Dict[str, Any]] = []
+    counts = {"success": 0, "error": 0, "skipped": 0}
+
+    def emit(res: Dict[str, Any]) -> None:
+        counts[res["status"]] = counts.get(res["status"], 0) + 1
+        if args.jsonl:
+            # One line per record as soon as it (and all before it) finish
+            sys.stdout.write(json_line(res) + "\n")
+            sys.stdout.flush()
+        else:
+            results.append(res)
+
+    for res in skipped:
+        emit(res)
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        for res in ex.map(lambda rec: process_record(rec, session, args, repo_index), records):
+            emit(res)
+
+    if args.jsonl:
+        print(json_line({"summary": counts}))
+    else:
+        print(json_dumps({"results": results}))
     # Non-zero if any error
-    if any(r.get("status") == "error" for r in results):
-        return 1
-    return 0
+    return 1 if counts["error"] else 0
 
 if __name__ == "__main__":
     sys.exit(main())
@@ -3,19 +3,42 @@ import argparse
 import base64
 import json
 import os
+import re
 import shutil
 import subprocess
 import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, Optional, Tuple
+from urllib.parse import quote
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
-def sh(cmd, cwd=None, check=True):
-    p = subprocess.run(cmd, cwd=cwd, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+# user:token@ in clone/push URLs; masked before a command line reaches an error/log
+URL_CREDENTIALS_RE = re.compile(r"(\w+://)[^/@\s]+@")
+
+
+def redact(text: str) -> str:
+    return URL_CREDENTIALS_RE.sub(r"\1***@", text)
+
+
+def sh(cmd, cwd=None, check=True, started=None):
+    # stdout is never used; stderr is drained as it arrives and only its tail is
+    # kept, so a big clone/push can neither fill the pipe nor grow memory.
+    # `started` is handed the Popen, so a caller on another thread can kill it.
+    p = subprocess.Popen(cmd, cwd=cwd, text=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if started is not None:
+        started(p)
+    tail = deque(p.stderr, maxlen=400)
+    p.wait()
     if check and p.returncode != 0:
-        raise RuntimeError(f"CMD failed: {' '.join(cmd)}\nSTDOUT:\n{p.stdout}\nSTDERR:\n{p.stderr}")
+        raise RuntimeError(redact(f"CMD failed: {' '.join(cmd)}\nSTDERR:\n{''.join(tail)}"))
     return p
 
 
@@ -24,17 +47,42 @@ def ado_headers(pat: str) -> Dict[str, str]:
     return {"Accept": "application/json", "Authorization": f"Basic {auth}"}
 
 
-def ensure_ado_repo(org: str, project: str, name: str, headers: Dict[str, str]) -> Tuple[str, bool]:
-    # list repos
-    url = f"https://dev.azure.com/{org}/{project}/_apis/git/repositories?api-version=7.0"
-    r = requests.get(url, headers=headers, timeout=30)
-    if r.status_code != 200:
-        raise RuntimeError(f"List repos failed: {r.status_code} {r.text}")
-    for repo in r.json().get("value", []):
-        if repo["name"].lower() == name.lower():
-            return repo["id"], False
+class AdoRetry(Retry):
+    """
+    GETs retry on throttling / transient 5xx (allowed_methods). POSTs retry on 429
+    only: ADO applies nothing it throttles, so replaying a 429'd repo create, push
+    or PR can't duplicate it. Retry-After is honoured either way.
+    """
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if method == "POST" and status_code == 429:
+            return True
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+def ado_session(pat: str) -> requests.Session:
+    """
+    Keep-alive session for the ADO REST calls (one TLS handshake). GETs are
+    retried on throttling / transient 5xx; push and PR POSTs only on 429 (see
+    AdoRetry), since after a 5xx they may already have been applied server-side.
+    """
+    session = requests.Session()
+    session.headers.update(ado_headers(pat))
+    retry = AdoRetry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=["GET"], raise_on_status=False)
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=retry))
+    return session
+
+
+def ensure_ado_repo(org: str, project: str, name: str, session: requests.Session) -> Tuple[str, bool]:
+    # look the repo up by name (ADO accepts it in place of the id, case-insensitively)
+    r = session.get(f"https://dev.azure.com/{org}/{project}/_apis/git/repositories/{quote(name, safe='')}?api-version=7.0", timeout=30)
+    if r.status_code == 200:
+        return r.json()["id"], False
+    if r.status_code != 404:
+        raise RuntimeError(f"Get repo failed: {r.status_code} {r.text}")
     # create
-    r = requests.post(url, headers=headers, json={"name": name}, timeout=30)
+    url = f"https://dev.azure.com/{org}/{project}/_apis/git/repositories?api-version=7.0"
+    r = session.post(url, json={"name": name}, timeout=30)
     if r.status_code not in (200, 201):
         raise RuntimeError(f"Create repo failed: {r.status_code} {r.text}")
     return r.json()["id"], True
@@ -55,19 +103,78 @@ def credentialize_source(url: str) -> str:
     return url
 
 
-def ado_default_branch(org: str, project: str, repo_id: str, headers: Dict[str, str]) -> str:
+def ado_default_branch(org: str, project: str, repo_id: str, session: requests.Session) -> str:
     url = f"https://dev.azure.com/{org}/{project}/_apis/git/repositories/{repo_id}?api-version=7.0"
-    r = requests.get(url, headers=headers, timeout=30)
+    r = session.get(url, timeout=30)
     if r.status_code != 200:
         return "main"
     ref = r.json().get("defaultBranch") or "refs/heads/main"
     return ref.split("/")[-1]
 
 
-def open_pr(org: str, project: str, repo_id: str, src: str, tgt: str, title: str, desc: str, headers: Dict[str, str]) -> Tuple[bool, str]:
+def ado_branch_tip(org: str, project: str, repo_id: str, branch: str, session: requests.Session) -> Optional[str]:
+    url = f"https://dev.azure.com/{org}/{project}/_apis/git/repositories/{repo_id}/refs?filter=heads/{branch}&api-version=7.0"
+    r = session.get(url, timeout=30)
+    if r.status_code != 200:
+        return None
+    # filter is a prefix match (heads/main also returns heads/main-old): pick the exact ref
+    for ref in r.json().get("value", []):
+        if ref["name"] == f"refs/heads/{branch}":
+            return ref["objectId"]
+    return None
+
+
+def push_yaml_branch(org: str, project: str, repo_id: str, base: str, feat: str,
+                     yaml_path: str, content: bytes, session: requests.Session) -> None:
+    """Create branch `feat` from the tip of `base` with a single commit adding/updating yaml_path."""
+    tip = ado_branch_tip(org, project, repo_id, base, session)
+    if not tip:
+        raise RuntimeError(f"Base branch '{base}' not found in ADO repo {repo_id}")
+    url = f"https://dev.azure.com/{org}/{project}/_apis/git/repositories/{repo_id}/pushes?api-version=7.0"
+    author = {"name": os.environ.get("GIT_USERNAME", "migration-bot"),
+              "email": os.environ.get("GIT_EMAIL", "migration-bot@example.com")}
+    # base64 content lands in the repo byte-for-byte (BOM, line endings), with no decode step
+    encoded = base64.b64encode(content).decode("ascii")
+    def push(change_type: str) -> requests.Response:
+        body = {
+            "refUpdates": [{"name": f"refs/heads/{feat}", "oldObjectId": tip}],
+            "commits": [{
+                "comment": "Add Azure Pipelines YAML (migrated from Jenkins)",
+                "author": author,
+                "changes": [{
+                    "changeType": change_type,
+                    "item": {"path": yaml_path},
+                    "newContent": {"content": encoded, "contentType": "base64encoded"},
+                }],
+            }],
+        }
+        return session.post(url, json=body, timeout=60)
+
+    r = push("add")
+    if r.status_code in (200, 201):
+        return
+    # Only a file already at yaml_path on base warrants "edit"; any other
+    # rejection (bad ref, invalid path, ...) is reported as-is
+    if r.status_code in (400, 409) and path_already_exists(r):
+        r = push("edit")
+        if r.status_code in (200, 201):
+            return
+    raise RuntimeError(f"Push failed: {r.status_code} {r.text}")
+
+
+def path_already_exists(r: requests.Response) -> bool:
+    """True if a rejected push says the "add" target path already exists."""
+    try:
+        message = r.json().get("message") or ""
+    except ValueError:
+        message = r.text
+    return "already exists" in message.lower()
+
+
+def open_pr(org: str, project: str, repo_id: str, src: str, tgt: str, title: str, desc: str, session: requests.Session) -> Tuple[bool, str]:
     url = f"https://dev.azure.com/{org}/{project}/_apis/git/repositories/{repo_id}/pullrequests?api-version=7.0"
     body = {"sourceRefName": f"refs/heads/{src}", "targetRefName": f"refs/heads/{tgt}", "title": title, "description": desc}
-    r = requests.post(url, headers=headers, json=body, timeout=60)
+    r = session.post(url, json=body, timeout=60)
     if r.status_code not in (200, 201):
         return False, f"Create PR failed: {r.status_code} {r.text}"
     pr = r.json()
@@ -97,64 +204,62 @@ def main():
     if not ado_pat:
         raise SystemExit("Missing ADO_PAT in environment")
 
-    headers = ado_headers(ado_pat)
+    session = ado_session(ado_pat)
     ado_repo_name = args.ado_repo or repo_name_from_source(args.source)
 
-    # 1) Ensure ADO repo exists
-    try:
-        repo_id, created = ensure_ado_repo(args.ado_org, args.ado_project, ado_repo_name, headers)
-    except Exception as e:
-        if args.create_if_missing:
-            raise
-        raise SystemExit(f"Repo not found and create-if-missing is false: {e}")
-
-    # 2) Mirror source -> ADO
     tmp = Path(tempfile.mkdtemp(prefix="mirror-"))
     try:
+        # 1) Start the source mirror clone in the background: it talks to the
+        #    source host while the ADO repo lookup/creation below talks to ADO
         src_url = credentialize_source(args.source)
         bare = tmp / "src.git"
-        sh(["git", "clone", "--mirror", src_url, str(bare)])
+        clone_procs = []
+        aborted = threading.Event()
+
+        def track(p):
+            clone_procs.append(p)
+            if aborted.is_set():
+                p.kill()
+
+        with ThreadPoolExecutor(max_workers=1) as ex:
+            clone = ex.submit(sh, ["git", "clone", "--mirror", src_url, str(bare)], started=track)
+
+            # 2) Ensure ADO repo exists
+            try:
+                repo_id, created = ensure_ado_repo(args.ado_org, args.ado_project, ado_repo_name, session)
+            except Exception as e:
+                # Don't let the `with` wait out a clone nobody will push: cancel it
+                # if it hasn't started, kill git if it has (track() catches a late start)
+                aborted.set()
+                ex.shutdown(wait=False, cancel_futures=True)
+                for p in clone_procs:
+                    p.kill()
+                if args.create_if_missing:
+                    raise
+                raise SystemExit(f"Repo not found and create-if-missing is false: {e}")
+            clone.result()
+
+        # 3) Mirror source -> ADO
         ado_url = ado_repo_https_url(args.ado_org, args.ado_project, ado_repo_name, ado_pat)
-        sh(["git", "remote", "add", "ado", ado_url], cwd=str(bare))
-        sh(["git", "push", "--mirror", "ado"], cwd=str(bare))
-
-        # 3) Figure default branch on ADO
-        base = ado_default_branch(args.ado_org, args.ado_project, repo_id, headers)
-
-        # 4) Normal clone (not bare), create feature branch, add yaml, push
-        work = tmp / "work"
-        sh(["git", "clone", ado_url, str(work)])
-        # config identity
-        user_name = os.environ.get("GIT_USERNAME", "migration-bot")
-        user_email = os.environ.get("GIT_EMAIL", "migration-bot@example.com")
-        sh(["git", "config", "user.name", user_name], cwd=str(work))
-        sh(["git", "config", "user.email", user_email], cwd=str(work))
-
-        # checkout base
-        sh(["git", "checkout", base], cwd=str(work))
-
-        # create feature branch
-        import time
-        feat = f"{args.feature_prefix}-{int(time.time())}"
-        sh(["git", "checkout", "-b", feat], cwd=str(work))
+        # Push straight to the URL (no remote to configure)
+        sh(["git", "push", "--mirror", ado_url], cwd=str(bare))
 
-        # write yaml
-        ydst = work / args.yaml_path.lstrip("/")
-        ydst.parent.mkdir(parents=True, exist_ok=True)
-        ysrc = Path(args.yaml_file)
-        ydst.write_text(ysrc.read_text(encoding="utf-8"), encoding="utf-8")
+        # 4) Figure default branch on ADO
+        base = ado_default_branch(args.ado_org, args.ado_project, repo_id, session)
 
-        sh(["git", "add", args.yaml_path], cwd=str(work))
-        sh(["git", "commit", "-m", "Add Azure Pipelines YAML (migrated from Jenkins)"], cwd=str(work))
-        sh(["git", "push", "origin", feat], cwd=str(work))
+        # 5) Create the feature branch with the YAML in one REST push (no working clone)
+        feat = f"{args.feature_prefix}-{int(time.time())}"
+        yaml_content = Path(args.yaml_file).read_bytes()
+        push_yaml_branch(args.ado_org, args.ado_project, repo_id, base, feat,
+                         args.yaml_path, yaml_content, session)
 
-        # 5) Open PR
+        # 6) Open PR
         ok, msg = open_pr(
             args.ado_org, args.ado_project, repo_id,
             src=feat, tgt=base,
             title="Add Azure Pipelines YAML (migrated from Jenkins)",
             desc="This PR adds the Azure Pipelines YAML generated from the Jenkinsfile.",
-            headers=headers
+            session=session
         )
         result = {"status": "success" if ok else "error", "message": msg, "ado_repo": ado_repo_name, "feature": feat, "base": base}
         print(json.dumps(result, indent=2))
@@ -1,22 +1,35 @@
 #!/usr/bin/env python3
 import argparse
 import json
+import multiprocessing
+import multiprocessing.forkserver
 import os
 import re
 import shutil
 import subprocess
 import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 
 import yaml
 
+from yaml_quote import yaml_scalar
+
+# libyaml's C emitter when PyYAML was built with it, pure-Python otherwise
+YAML_DUMPER = yaml.CSafeDumper if yaml.__with_libyaml__ else yaml.SafeDumper
+
 
 # ---------------------------
 # Helpers: shell & clone
 # ---------------------------
 def run(cmd: List[str], cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None) -> subprocess.CompletedProcess:
-    return subprocess.run(cmd, cwd=cwd, env=env, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # Only the exit code and the tail of stderr (git's messages) are ever used
+    p = subprocess.Popen(cmd, cwd=cwd, env=env, text=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    tail = deque(p.stderr, maxlen=400)
+    p.wait()
+    return subprocess.CompletedProcess(cmd, p.returncode, "", "".join(tail))
 
 def _inject_github_token(url: str) -> str:
     """
@@ -61,49 +74,133 @@ def clone_or_use_path(repo: str) -> Path:
         url = _inject_github_token(url)
 
     tmp = Path(tempfile.mkdtemp(prefix="jenkins2ado-"))
-    cp = run(["git", "clone", "--depth", "1", url, str(tmp / "src")])
-    if cp.returncode != 0:
-        raise RuntimeError(f"Clone failed: {cp.stderr or cp.stdout}")
+    src = str(tmp / "src")
+    try:
+        # Partial clone: trees only up front, then a sparse checkout so the sole
+        # blobs fetched and written are files named Jenkinsfile
+        cp = run(["git", "clone", "--depth", "1", "--filter=blob:none", "--single-branch",
+                  "--no-tags", "--no-checkout", url, src])
+        if cp.returncode == 0:
+            cp = run(["git", "sparse-checkout", "set", "--no-cone", "Jenkinsfile"], cwd=src)
+        if cp.returncode == 0:
+            cp = run(["git", "checkout"], cwd=src)
+        if cp.returncode != 0:
+            # Older git/servers without partial clone or sparse-checkout: plain shallow clone
+            shutil.rmtree(src, ignore_errors=True)
+            cp = run(["git", "clone", "--depth", "1", url, src])
+        if cp.returncode != 0:
+            raise RuntimeError(f"Clone failed: {cp.stderr or cp.stdout}")
+    except BaseException:
+        # Nothing usable was cloned: don't leave the temp dir behind
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
     return (tmp / "src").resolve()
 
 # ---------------------------
 # Minimal Declarative parser
 # ---------------------------
-JENKINS_DECL_RE = re.compile(r"pipeline\s*\{(?P<body>[\s\S]*)\}\s*$", re.MULTILINE)
-
-def _strip_comments(s: str) -> str:
-    return re.sub(r"//.*", "", s)
-
-def _extract_block(src: str, block: str) -> Optional[str]:
-    m = re.search(rf"{block}\s*\{{", src)
-    if not m:
+ENV_KV_RE = re.compile(r"([A-Za-z_][A-Za-z0-9_]*)\s*=\s*['\"]([^'\"]+)['\"]", re.ASCII)
+# One match classifies a step line; the handler turns its quoted argument into a script
+STEP_RE = re.compile(r"(sh|echo)\s+['\"]([^'\"]+)['\"]")
+STEP_HANDLERS = {
+    "sh": lambda arg: arg,
+    "echo": lambda arg: f"echo {arg}",
+}
+# Everything the block scanner has to look at; plain text in between is skipped in C.
+# Single-line literals stop at a newline so a stray quote cannot swallow the file.
+TOKEN_RE = re.compile(
+    r"(?P<comment>//[^\n]*|/\*[\s\S]*?\*/)"
+    r"|'''[\s\S]*?'''|\"\"\"[\s\S]*?\"\"\"|'(?:\\.|[^'\\\n])*'|\"(?:\\.|[^\"\\\n])*\""
+    r"|(?P<open>\{)|(?P<close>\})"
+)
+# `name('arg')` at the very end of a block header; the arg may contain parens
+# but not its own quote character or a newline
+BLOCK_CALL_RE = re.compile(r"(\w+)\s*\(\s*(['\"])((?:(?!\2)[^\n])+)\2\s*\)$")
+AGENT_LABEL_RE = re.compile(r"label\s+['\"]([^'\"]+)['\"]")
+AGENT_IMAGE_RE = re.compile(r"image\s+['\"]([^'\"]+)['\"]")
+
+class Block:
+    """A labelled `{...}` range: `name('arg') {` -> name, arg; body is text[start:end]."""
+    __slots__ = ("name", "arg", "start", "end", "children")
+
+    def __init__(self, name: str, arg: Optional[str], start: int):
+        self.name, self.arg, self.start = name, arg, start
+        self.end: Optional[int] = None
+        self.children: List["Block"] = []
+
+    def walk(self):
+        for c in self.children:
+            yield c
+            yield from c.walk()
+
+    def find(self, name: str, closed: bool = True) -> Optional["Block"]:
+        """First descendant called `name` (by default only closed ones), in source order."""
+        for b in self.walk():
+            if b.name == name and (b.end is not None or not closed):
+                return b
         return None
-    i, depth, start = m.end(), 1, m.end()
-    while i < len(src):
-        if src[i] == "{":
-            depth += 1
-        elif src[i] == "}":
-            depth -= 1
-            if depth == 0:
-                return src[start:i]
-        i += 1
-    return None
+
+def _block_label(header: str):
+    """(name, arg) for the text leading up to a '{', e.g. "stage('Build') " -> ('stage', 'Build')."""
+    h = header.rstrip()
+    m = BLOCK_CALL_RE.search(h)
+    if m:
+        return m.group(1), m.group(3)
+    # Any other call, e.g. withEnv([...]) {: keep the name, no arg
+    if h.endswith(")"):
+        op = h.rfind("(")
+        if op >= 0:
+            h = h[:op].rstrip()
+    j = len(h)
+    while j and (h[j - 1].isalnum() or h[j - 1] == "_"):
+        j -= 1
+    return h[j:], None
+
+def scan_blocks(src: str):
+    """
+    One left-to-right pass over the Jenkinsfile: drops // and /* */ comments
+    (not inside string literals) and records every brace-balanced block.
+    Returns (text, root); Block offsets index into the comment-free `text`.
+    """
+    out: List[str] = []
+    size = 0
+    root = Block("", None, 0)
+    stack = [root]
+    header_from, pos = 0, 0
+    for m in TOKEN_RE.finditer(src):
+        out.append(src[pos:m.start()])
+        size += m.start() - pos
+        pos = m.end()
+        kind = m.lastgroup
+        if kind == "comment":
+            continue
+        tok = m.group()
+        if kind == "open":
+            name, arg = _block_label("".join(out[header_from:]))
+            block = Block(name, arg, size + 1)
+            stack[-1].children.append(block)
+            stack.append(block)
+        elif kind == "close" and len(stack) > 1:
+            stack.pop().end = size
+        out.append(tok)
+        size += len(tok)
+        if kind:
+            header_from = len(out)
+    out.append(src[pos:])
+    return "".join(out), root
 
 def parse_environment(block: str) -> Dict[str, str]:
-    env: Dict[str, str] = {}
-    flat = " ".join(block.splitlines())
-    for m in re.finditer(r"([A-Za-z_][A-Za-z0-9_]*)\s*=\s*['\"]([^'\"]+)['\"]", flat):
-        env[m.group(1)] = m.group(2)
-    return env
+    # \s in ENV_KV_RE already spans line breaks, so the block is matched as-is
+    return {m.group(1): m.group(2) for m in ENV_KV_RE.finditer(block)}
 
 def parse_agent(block: str) -> Dict[str, Any]:
     text = (block or "").strip()
     if text.startswith("any"):
         return {"type": "any"}
-    m = re.search(r"label\s+['\"]([^'\"]+)['\"]", text)
+    m = AGENT_LABEL_RE.search(text)
     if m:
         return {"type": "label", "label": m.group(1)}
-    m = re.search(r"image\s+['\"]([^'\"]+)['\"]", text)
+    m = AGENT_IMAGE_RE.search(text)
     if m:
         return {"type": "docker", "image": m.group(1)}
     return {"type": "any"}
@@ -114,13 +211,9 @@ def parse_steps(steps_block: str) -> List[Dict[str, Any]]:
         s = line.strip()
         if not s:
             continue
-        ms = re.match(r"sh\s+['\"]([^'\"]+)['\"]", s)
-        if ms:
-            steps.append({"script": ms.group(1)})
-            continue
-        me = re.match(r"echo\s+['\"]([^'\"]+)['\"]", s)
-        if me:
-            steps.append({"script": f"echo {me.group(1)}"})
+        m = STEP_RE.match(s)
+        if m:
+            steps.append({"script": STEP_HANDLERS[m.group(1)](m.group(2))})
             continue
         # Fallback: escape single quotes for a single-quoted shell string
         # Use the well-known shell trick: end quote, insert '"'"', resume quote
@@ -128,40 +221,27 @@ def parse_steps(steps_block: str) -> List[Dict[str, Any]]:
         steps.append({"script": f"echo 'UNHANDLED: {safe}'"})
     return steps
 
-def parse_stages(stages_block: str) -> List[Dict[str, Any]]:
-    stages: List[Dict[str, Any]] = []
-    text = stages_block or ""
-    for sm in re.finditer(r"stage\s*\(\s*['\"]([^'\"]+)['\"]\s*\)\s*\{", text):
-        name = sm.group(1)
-        i, depth, start = sm.end(), 1, sm.end()
-        while i < len(text):
-            if text[i] == "{":
-                depth += 1
-            elif text[i] == "}":
-                depth -= 1
-                if depth == 0:
-                    block = text[start:i]
-                    break
-            i += 1
-        else:
-            block = ""
-        steps_block = _extract_block(block, "steps") or ""
-        stages.append({"name": name, "steps": parse_steps(steps_block)})
-    return stages
+def _body(text: str, block: Optional[Block]) -> Optional[str]:
+    if block is None:
+        return None
+    return text[block.start:block.end if block.end is not None else len(text)]
+
+def parse_stages(text: str, stages: Optional[Block]) -> List[Dict[str, Any]]:
+    if stages is None:
+        return []
+    return [{"name": b.arg, "steps": parse_steps(_body(text, b.find("steps")) or "" if b.end is not None else "")}
+            for b in stages.walk() if b.name == "stage" and b.arg]
 
 def parse_jenkinsfile(jf_text: str) -> Dict[str, Any]:
-    t = _strip_comments(jf_text)
-    m = JENKINS_DECL_RE.search(t)
-    if not m:
+    text, root = scan_blocks(jf_text)
+    # An unterminated pipeline still runs to the end of the file
+    pipeline = root.find("pipeline", closed=False)
+    if pipeline is None:
         raise ValueError("Only Declarative pipelines supported (no 'pipeline { ... }' found).")
-    body = m.group("body")
-    agent_block = _extract_block(body, "agent") or "any"
-    env_block = _extract_block(body, "environment") or ""
-    stages_block = _extract_block(body, "stages") or ""
     return {
-        "agent": parse_agent(agent_block),
-        "environment": parse_environment(env_block),
-        "stages": parse_stages(stages_block),
+        "agent": parse_agent(_body(text, pipeline.find("agent")) or "any"),
+        "environment": parse_environment(_body(text, pipeline.find("environment")) or ""),
+        "stages": parse_stages(text, pipeline.find("stages")),
     }
 
 
@@ -178,7 +258,7 @@ def env_to_yaml(env: Dict[str, str]) -> str:
     if not env:
         return ""
     variables = [{"name": k, "value": str(v)} for k, v in env.items()]
-    yaml_text = yaml.safe_dump(variables, sort_keys=False, default_flow_style=False)
+    yaml_text = yaml.dump(variables, Dumper=YAML_DUMPER, sort_keys=False, default_flow_style=False)
     # indent by 2 spaces to sit under 'variables:'
     return "".join(f"  {line}" for line in yaml_text.splitlines(True))
 
@@ -193,69 +273,79 @@ def render_ado_yaml(model: Dict[str, Any]) -> str:
     pool = guess_pool(model.get("agent", {}))
     variables_snippet = env_to_yaml(model.get("environment", {}))
 
-    stages_yaml: List[str] = []
-    for st in model.get("stages", []):
-        steps_yaml = []
+    # Every fragment is appended at its final indentation and joined once at the end
+    out: List[str] = []
+    if variables_snippet:
+        out += ["variables:\n", variables_snippet, "\n"]
+    stages = model.get("stages", [])
+    if not stages:
+        out.append("steps:\n- script: echo No stages parsed from Jenkinsfile\n  displayName: Fallback\n")
+        return "".join(out)
+
+    out.append("stages:\n")
+    for st in stages:
+        out += [
+            f"- stage: {yaml_scalar(st['name'])}\n",
+            "  jobs:\n",
+            "  - job: job\n",
+            "    pool:\n",
+            f"      vmImage: {pool['vmImage']}\n",
+            "    steps:\n",
+        ]
+        n = len(out)
         for step in st.get("steps", []):
             script = step.get("script", "").strip()
             if script:
-                # Use yaml to ensure proper quoting in script and displayName
-                script_yaml = yaml.safe_dump(script, default_flow_style=False).strip()
-                dn_yaml = yaml.safe_dump(script[:60], default_flow_style=False).strip()
-                steps_yaml.append(f"- script: {script_yaml}\n  displayName: {dn_yaml}")
-        if steps_yaml:
-            steps_block = "\n".join(steps_yaml)
-        else:
-            steps_block = "- script: echo No steps parsed\n  displayName: Fallback"
-
-        jobs_yaml = (
-            "- job: job\n"
-            "  pool:\n"
-            f"    vmImage: {pool['vmImage']}\n"
-            "  steps:\n"
-            + "\n".join(f"    {line}" for line in steps_block.splitlines(True))
-        )
-        stages_yaml.append(f"- stage: {st['name']}\n  jobs:\n  {jobs_yaml}")
-
-    body = []
-    if variables_snippet:
-        body.append("variables:\n" + variables_snippet)
-    if stages_yaml:
-        body.append("stages:\n" + "\n".join(stages_yaml))
-    else:
-        body.append("steps:\n- script: echo No stages parsed from Jenkinsfile\n  displayName: Fallback")
-    return "\n".join(body) + "\n"
+                out += [f"    - script: {yaml_scalar(script)}\n",
+                        f"      displayName: {yaml_scalar(script[:60])}\n"]
+        if len(out) == n:
+            out.append("    - script: echo No steps parsed\n      displayName: Fallback\n")
+    return "".join(out)
 
 
 # ---------------------------
 # Entry
 # ---------------------------
+SKIP_DIRS = {".git", "node_modules", "vendor", "target", "build", "dist", ".venv", "venv"}
+
+def _find_shallow(root: Path, name: str, max_depth: int = 3) -> Optional[Path]:
+    """Breadth-first search for `name` at most max_depth dirs below root, skipping SKIP_DIRS."""
+    queue = deque([(str(root), 0)])
+    while queue:
+        d, depth = queue.popleft()
+        try:
+            with os.scandir(d) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name == name and entry.is_file():
+                return Path(entry.path)
+            if depth < max_depth and entry.name not in SKIP_DIRS and entry.is_dir(follow_symlinks=False):
+                queue.append((entry.path, depth + 1))
+    return None
+
 def find_jenkinsfile(repo_root: Path) -> Path:
     # common places
     for cand in ["Jenkinsfile", "jenkins/Jenkinsfile", ".jenkins/Jenkinsfile", "ci/Jenkinsfile"]:
         p = repo_root / cand
         if p.is_file():
             return p
-    # fallback: search shallow
-    for p in repo_root.rglob("Jenkinsfile"):
-        return p
-    raise FileNotFoundError("Jenkinsfile not found in repository.")
-
-def main():
-    ap = argparse.ArgumentParser(description="Auto-convert Jenkins Declarative pipeline → Azure DevOps YAML")
-    ap.add_argument("--repo", required=True, help="Local path or Git URL (GitHub supported with GIT_TOKEN)")
-    ap.add_argument("--out-dir", required=True, help="Output folder for azure-pipelines.yml and summary.json")
-    args = ap.parse_args()
-
-    out_dir = Path(args.out_dir).resolve()
+    # fallback: shallowest Jenkinsfile near the root
+    p = _find_shallow(repo_root, "Jenkinsfile")
+    if p is None:
+        raise FileNotFoundError("Jenkinsfile not found in repository.")
+    return p
+
+def convert_checkout(repo: str, repo_root: str, out_dir: str) -> Dict[str, Any]:
+    """Convert the Jenkinsfile of a checked-out repo into out_dir; returns the summary."""
+    repo_root, out_dir = Path(repo_root), Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    # Clone or use existing
-    repo_root = clone_or_use_path(args.repo)
-
     # Locate Jenkinsfile
     jf_path = find_jenkinsfile(repo_root)
-    jf_text = jf_path.read_text(encoding="utf-8", errors="ignore")
+    # One read + bytes.decode; read_text would go through an incremental TextIOWrapper decoder
+    jf_text = jf_path.read_bytes().decode("utf-8", "ignore")
 
     # Parse -> model -> render
     model = parse_jenkinsfile(jf_text)
@@ -264,7 +354,7 @@ def main():
     # Write outputs
     (out_dir / "azure-pipelines.yml").write_text(ado_yaml, encoding="utf-8")
     summary = {
-        "repo": args.repo,  # <-- REQUIRED so downstream knows the source URL
+        "repo": repo,  # <-- REQUIRED so downstream knows the source URL
         "repo_root": str(repo_root),
         "jenkinsfile": str(jf_path),
         "agent": model.get("agent"),
@@ -273,13 +363,111 @@ def main():
         "out_yaml": str(out_dir / "azure-pipelines.yml"),
     }
     (out_dir / "summary.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    return summary
 
-
-    # Cleanup temp if we cloned into a temp dir
+def cleanup_clone(repo_root: Path) -> None:
+    # Only remove temp dirs we cloned into, never a local path the user passed
     parent = repo_root.parent
     if "jenkins2ado-" in parent.name and parent.exists():
         shutil.rmtree(parent, ignore_errors=True)
 
+def repo_slug(repo: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "-", repo.strip()).strip("-") or "repo"
+
+def unique_slug(repo: str, taken: set) -> str:
+    """repo_slug(repo), suffixed -2, -3, ... until it differs (case-insensitively) from every slug in taken."""
+    base = slug = repo_slug(repo)
+    n = 1
+    while slug.lower() in taken:
+        n += 1
+        slug = f"{base}-{n}"
+    taken.add(slug.lower())
+    return slug
+
+def iter_repo_list(path: str) -> Iterator[str]:
+    """Yield each repo in a --batch file once, skipping blank lines and '#' comments."""
+    seen = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            repo = line.strip()
+            if repo and not repo.startswith("#") and repo not in seen:
+                seen.add(repo)
+                yield repo
+
+def main_batch(repos: Iterable[str], out_root: Path, jobs: int) -> List[Dict[str, Any]]:
+    """
+    Convert many repos into out_root/<slug>/ (slugs that would collide get a
+    numeric suffix, in input order). Clones are network-bound and run on
+    a thread pool; each checkout's parse/render is CPU-bound and goes to a
+    process pool as soon as its clone lands.
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    # Workers come from a forkserver, never fork(): forking while clone threads
+    # run would hand the children git's stderr pipes (so run() never sees EOF)
+    # and locks held by those threads.
+    ctx = multiprocessing.get_context("forkserver")
+    # Start the server now, while this process is still single-threaded: repos are
+    # streamed, so clone threads are always live by the time the first worker is needed
+    multiprocessing.forkserver.ensure_running()
+    with ThreadPoolExecutor(max_workers=jobs) as clones, \
+            ProcessPoolExecutor(max_workers=jobs, mp_context=ctx) as workers:
+        # Clones start while the list is still being read; `order` keeps input order
+        order: List[str] = []
+        slugs: Dict[str, str] = {}
+        taken: set = set()
+        cloning = {}
+        for repo in repos:
+            order.append(repo)
+            slugs[repo] = unique_slug(repo, taken)
+            cloning[clones.submit(clone_or_use_path, repo)] = repo
+        converting = {}
+        for fut in as_completed(cloning):
+            repo = cloning[fut]
+            try:
+                root = fut.result()
+            except Exception as e:
+                results[repo] = {"repo": repo, "status": "error", "message": str(e)}
+                continue
+            job = workers.submit(convert_checkout, repo, str(root), str(out_root / slugs[repo]))
+            converting[job] = (repo, root)
+        for fut in as_completed(converting):
+            repo, root = converting[fut]
+            try:
+                results[repo] = {"repo": repo, "status": "ok", "summary": fut.result()}
+            except Exception as e:
+                results[repo] = {"repo": repo, "status": "error", "message": str(e)}
+            finally:
+                cleanup_clone(root)
+    return [results[repo] for repo in order]
+
+def main():
+    ap = argparse.ArgumentParser(description="Auto-convert Jenkins Declarative pipeline → Azure DevOps YAML")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--repo", help="Local path or Git URL (GitHub supported with GIT_TOKEN)")
+    src.add_argument("--batch", help="File listing one repo (path or URL) per line; outputs go to <out-dir>/<slug>/")
+    ap.add_argument("--out-dir", required=True, help="Output folder for azure-pipelines.yml and summary.json")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 4, help="Parallel clones/conversions in --batch mode")
+    args = ap.parse_args()
+
+    out_dir = Path(args.out_dir).resolve()
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    if args.batch:
+        results = main_batch(iter_repo_list(args.batch), out_dir, max(1, args.jobs))
+        failed = any(r["status"] == "error" for r in results)
+        print(json.dumps({"status": "error" if failed else "ok", "results": results}, indent=2))
+        if failed:
+            raise SystemExit(1)
+        return
+
+    # Clone or use existing
+    repo_root = clone_or_use_path(args.repo)
+    try:
+        summary = convert_checkout(args.repo, str(repo_root), str(out_dir))
+    finally:
+        # Cleanup temp if we cloned into a temp dir
+        cleanup_clone(repo_root)
+
     print(json.dumps({"status": "ok", "summary": summary}, indent=2))
 
 if __name__ == "__main__":
@@ -0,0 +1,30 @@
+"""
+YAML scalar quoting shared by the converters (convert_jenkinsfile.py and
+tools/auto_convert_repo_to_ado_yaml.py), so a quoting fix lands in one place.
+"""
+import re
+
+# Scalars that can be written unquoted: start with a letter, no YAML indicators,
+# and not one of the words a YAML 1.1 reader would turn into a bool/null.
+PLAIN_SCALAR_RE = re.compile(r"[A-Za-z][\w .,/@+=()-]*(?<! )")
+RESERVED_SCALAR_RE = re.compile(r"y|n|yes|no|true|false|on|off|null", re.IGNORECASE)
+
+def _yaml_escape(c: str) -> str:
+    if c in '\\"':
+        return "\\" + c
+    if c.isprintable():
+        return c
+    o = ord(c)
+    return f"\\x{o:02x}" if o < 0x100 else f"\\u{o:04x}" if o < 0x10000 else f"\\U{o:08x}"
+
+def yaml_scalar(value: str) -> str:
+    """
+    Quote a string for a YAML value without going through a Dumper: bare when
+    it is unambiguously a plain scalar, single-quoted otherwise. Strings with
+    non-printable characters are double-quoted with those characters escaped.
+    """
+    if not value.isprintable():
+        return '"' + "".join(_yaml_escape(c) for c in value) + '"'
+    if PLAIN_SCALAR_RE.fullmatch(value) and not RESERVED_SCALAR_RE.fullmatch(value):
+        return value
+    return "'" + value.replace("'", "''") + "'"